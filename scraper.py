@@ -1,12 +1,18 @@
 # Basketball Reference Top 15 Leaders Scraper
 
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 import sys
 import datetime
 import time
+import random
+import json
+import re
+import csv
+import functools
+from collections import namedtuple
 from urllib.error import URLError, HTTPError
 import logging
 
@@ -37,51 +43,257 @@ STAT_MAP = {
     "free throw percentage": "leaders_ft_pct"
 }
 
+# This part of the code compiles the pattern for the team abbreviation shown after each player, e.g. "(OKC)", or "(2TM)" for players traded mid-season.
+TEAM_RE = re.compile(r'\(([A-Z0-9]{2,3})\)')
+
+# This part of the code matches opening and closing div tags, used to find where a statistic's div ends in the raw HTML.
+DIV_TAG_RE = re.compile(r'<(/?)div\b', re.IGNORECASE)
+
+# This part of the code sorts the statistic names once, this order is used both for the menu and for mapping numeric choices back to a statistic.
+SORTED_STATS = sorted(STAT_MAP.keys())
+
+# This part of the code keeps the downloaded page in memory, keyed by URL, as (html_text, fetched_at). The leaders page holds every statistic table, so one download serves all selections until the user asks for a refresh.
+HTML_CACHE = {}
+
+# This part of the code defines where HTTP validators (ETag / Last-Modified) and the last response body are stored between runs, so unchanged pages can be revalidated instead of re-downloaded.
+HTTP_CACHE_FILE = os.path.join('data', '.http_cache.json')
+
+# This part of the code adds full jitter to urllib3's exponential backoff. Each retry waits a random time between zero and the exponential delay, so several clients failing together do not all retry at the same moment.
+class JitteredRetry(Retry):
+    """Retry policy that applies full jitter to the exponential backoff delay."""
+    
+    def get_backoff_time(self):
+        return random.uniform(0, super().get_backoff_time())
+
+# This part of the code creates one shared HTTP session for the whole program. It reuses TCP/TLS connections across requests, asks for compressed responses, and lets urllib3 handle retries with jittered exponential backoff.
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 2
+
+SESSION = requests.Session()
+SESSION.headers.update({
+    "User-Agent": USER_AGENT,
+    "Accept-Encoding": "gzip, deflate"
+})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=JitteredRetry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=[429, 500, 502, 503, 504]
+    )
+))
+
+# This part of the code defines the lightweight container returned by the parser: three parallel tuples of player names, team abbreviations and statistic values.
+Leaders = namedtuple('Leaders', ['players', 'teams', 'values'])
+
+# This part of the code sets the write buffer used for CSV output. A large buffer means fewer write calls when many or larger tables are exported.
+CSV_BUFFER_SIZE = 1 << 20
+
 # This part of the code creates a directory to store CSV files if it doesn't already exist. It organizes the data output files in a structured manner.
 def create_output_directory():
     """Create directory for storing CSV outputs if it doesn't exist."""
     os.makedirs('data', exist_ok=True)
     logger.info("Created output directory if it didn't exist.")
 
-# This part of the code implements a function to fetch data from the Basketball Reference website. It includes error handling for various issues and retries on failures.
-def fetch_data(url, max_retries=3, delay=2):
-    """Fetch data from the specified URL with retry mechanism."""
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+# This part of the code loads and saves the on-disk HTTP cache. A missing or corrupt cache file is treated as empty rather than as an error.
+def load_http_cache():
+    """Load the HTTP cache from disk, returning an empty dict if unavailable."""
+    try:
+        with open(HTTP_CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_http_cache(cache):
+    """Write the HTTP cache to disk."""
+    try:
+        os.makedirs(os.path.dirname(HTTP_CACHE_FILE), exist_ok=True)
+        with open(HTTP_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+    except OSError as e:
+        logger.warning("Could not write HTTP cache: %s", e)
+
+# This part of the code works out how long a response stays fresh: the Cache-Control max-age minus the Age a CDN reports the copy already has. It returns None when the response may not be reused without revalidation.
+def parse_max_age(response_headers):
+    """Return the remaining freshness lifetime in seconds from response headers, or None."""
+    cache_control = response_headers.get("Cache-Control")
+    if not cache_control or 'no-cache' in cache_control or 'no-store' in cache_control:
+        return None
+    match = re.search(r'max-age=(\d+)', cache_control)
+    if not match:
+        return None
+    try:
+        age = int(response_headers.get("Age", 0))
+    except ValueError:
+        age = 0
+    return max(0, int(match.group(1)) - age)
+
+# This part of the code implements a function to fetch data from the Basketball Reference website. It goes through the shared session, which retries failed requests, and uses conditional requests so an unchanged page is not downloaded again.
+def fetch_data(url, revalidate=False):
+    """Fetch data from the specified URL using the shared session and HTTP caching.
+    
+    When revalidate is True the max-age shortcut is skipped and the server is always asked.
+    """
+    headers = {}
+    
+    cache = load_http_cache()
+    entry = cache.get(url)
+    if entry and 'body' not in entry:
+        entry = None
+    if entry:
+        # Serve straight from the cache while the server's max-age has not expired
+        max_age = entry.get('max_age')
+        if not revalidate and max_age is not None and time.time() - entry.get('fetched_at', 0) < max_age:
+            logger.info("Using cached copy of %s (within max-age)", url)
+            return entry['body']
+        if entry.get('etag'):
+            headers["If-None-Match"] = entry['etag']
+        if entry.get('last_modified'):
+            headers["If-Modified-Since"] = entry['last_modified']
+    
+    try:
+        logger.info("Fetching data from %s", url)
+        response = SESSION.get(url, headers=headers, timeout=10)
+        
+        if response.status_code == 304 and entry:
+            logger.info("%s not modified, using cached copy", url)
+            entry['fetched_at'] = time.time()
+            entry['max_age'] = parse_max_age(response.headers)
+            save_http_cache(cache)
+            return entry['body']
+        
+        if response.status_code == 304:
+            # Nothing cached to fall back on, so ask again for the full page
+            logger.info("%s returned 304 without a cached copy, refetching", url)
+            response = SESSION.get(url, headers={"Cache-Control": "no-cache"}, timeout=10)
+            if response.status_code == 304:
+                raise requests.exceptions.HTTPError(f"Unexpected 304 Not Modified for {url}", response=response)
+        
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        if isinstance(e, requests.exceptions.RetryError):
+            logger.error("Failed to fetch %s after %d retries: %s", url, MAX_RETRIES, e)
+        else:
+            logger.error("Failed to fetch %s: %s", url, e)
+        raise
+    
+    cache[url] = {
+        'etag': response.headers.get("ETag"),
+        'last_modified': response.headers.get("Last-Modified"),
+        'max_age': parse_max_age(response.headers),
+        'fetched_at': time.time(),
+        'body': response.text
     }
+    save_http_cache(cache)
+    return response.text
+
+# This part of the code streams the page and stops reading as soon as the selected statistic's div has closed, so a single statistic can be fetched without downloading or scanning the rest of the page. The result is not cached, because it only holds one table.
+def fetch_stat_html(url, stat_id, chunk_size=8192):
+    """Stream the page and return the HTML fragment for one statistic, or None if it is not found."""
+    start_re = stat_div_re(stat_id)
+    text = ""
+    start = -1
+    depth = 0
+    scan_pos = 0
+    close_pos = -1
     
-    for attempt in range(max_retries):
-        try:
-            logger.info(f"Fetching data from {url}, attempt {attempt+1}/{max_retries}")
-            response = requests.get(url, headers=headers, timeout=10)
+    try:
+        logger.info("Streaming %s for %s", url, stat_id)
+        with SESSION.get(url, stream=True, timeout=10) as response:
             response.raise_for_status()
-            return response.text
-        except requests.exceptions.RequestException as e:
-            logger.warning(f"Request failed: {e}")
-            if attempt < max_retries - 1:
-                wait_time = delay * (attempt + 1)
-                logger.info(f"Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-            else:
-                logger.error(f"Failed to fetch data after {max_retries} attempts.")
-                raise
+            if response.encoding is None:
+                response.encoding = 'utf-8'
+            
+            for chunk in response.iter_content(chunk_size, decode_unicode=True):
+                # An opening tag split across chunks starts at or after the last '<' already received
+                search_from = max(text.rfind('<'), 0)
+                text += chunk
+                
+                if start == -1:
+                    match = start_re.search(text, search_from)
+                    if not match:
+                        continue
+                    start = scan_pos = match.start()
+                
+                if close_pos == -1:
+                    # Count div tags only in newly received text, leaving room for a tag cut off at the end
+                    safe_end = len(text) - len('</div>')
+                    for tag in DIV_TAG_RE.finditer(text, scan_pos):
+                        if tag.start() >= safe_end:
+                            break
+                        depth += -1 if tag.group(1) else 1
+                        if depth == 0:
+                            close_pos = tag.end()
+                            break
+                    scan_pos = max(scan_pos, safe_end)
+                
+                if close_pos != -1:
+                    end = text.find('>', close_pos)
+                    if end != -1:
+                        # Leaving the with block closes the connection without reading the rest
+                        return text[start:end + 1]
+    except requests.exceptions.RequestException as e:
+        logger.error("Failed to stream data: %s", e)
+        raise
+    
+    return extract_stat_html(text, stat_id)
+
+# This part of the code returns the page HTML from the in-memory cache, fetching it only on the first request or when a refresh is forced.
+def get_html(url, refresh=False):
+    """Return cached HTML for the URL, fetching it if missing or if refresh is requested."""
+    if refresh or url not in HTML_CACHE:
+        HTML_CACHE[url] = (fetch_data(url, revalidate=refresh), datetime.datetime.now())
+        parse_data_cached.cache_clear()
+    else:
+        logger.info("Using cached page for %s (fetched at %s)", url, HTML_CACHE[url][1])
+    return HTML_CACHE[url][0]
+
+# This part of the code cuts the selected statistic's div out of the raw page with a regex scan, so only that fragment has to be parsed. It also finds tables that Basketball Reference ships inside HTML comments, which a DOM parser would skip.
+def stat_div_re(stat_id):
+    """Return a pattern matching the opening div tag for the given statistic, with either quote style."""
+    return re.compile(r'<div\b[^>]*\bid=["\']%s["\']' % re.escape(stat_id))
+
+def extract_stat_html(html_content, stat_id):
+    """Return the HTML fragment for the div with the given ID, or None if it is not present."""
+    start = stat_div_re(stat_id).search(html_content)
+    if not start:
+        return None
+    
+    depth = 0
+    for tag in DIV_TAG_RE.finditer(html_content, start.start()):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            end = html_content.find('>', tag.end())
+            return html_content[start.start():end + 1 if end != -1 else len(html_content)]
+    return html_content[start.start():]
 
 # This part of the code parses the HTML content to extract the relevant statistics table. It converts the raw HTML into structured data that can be analyzed.
 def parse_data(html_content, stat_id):
     """Parse HTML content and extract the relevant statistics table."""
+    # Imported here so the interactive prompt does not pay the bs4 import cost at startup
+    from bs4 import BeautifulSoup
+    
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
+        # Only build a tree for the target div instead of the whole page
+        fragment = extract_stat_html(html_content, stat_id)
+        if fragment is None:
+            logger.error("Could not find table with ID: %s", stat_id)
+            return None
+        
+        soup = BeautifulSoup(fragment, 'lxml')
         table = soup.find('div', {'id': stat_id})
         
         if not table:
-            logger.error(f"Could not find table with ID: {stat_id}")
+            logger.error("Could not find table with ID: %s", stat_id)
             return None
             
         players = []
         teams = []
-        values = []
+        raw_values = []
         
-        rows = table.find_all('tr')[1:16]  # Top 15 players
+        rows = table.find_all('tr', limit=16)[1:]  # Top 15 players
         
         for row in rows:
             player_cell = row.find('td', {'class': 'who'})
@@ -89,35 +301,35 @@ def parse_data(html_content, stat_id):
                 # Extract just the player name without team info
                 player_name = player_cell.find('a').text.strip() if player_cell.find('a') else ""
                 
-                # Extract team abbreviation from the text
-                team_span = player_cell.find('span', {'class': 'desc'})
-                if team_span:
-                    team_text = team_span.text.strip()
-                    # The text is in "(OKC)" format.
-                    team_abbr = team_text.strip('()') if team_text else ""
-                else:
-                    team_abbr = ""
+                # Extract team abbreviation from the cell text, which is in "Name (OKC)" format
+                match = TEAM_RE.search(player_cell.get_text(' ', strip=True))
+                team_abbr = match.group(1) if match else ""
                 
                 value_cell = row.find('td', {'class': 'value'})
-                value = float(value_cell.text.strip()) if value_cell else None
                 
                 players.append(player_name)
                 teams.append(team_abbr)
-                values.append(value)
+                raw_values.append(value_cell.text.strip() if value_cell else None)
         
-        return pd.DataFrame({
-            'Player': players,
-            'Team': teams,
-            'Value': values
-        })
+        # Convert all values in one pass once the rows have been collected; missing cells stay None
+        values = [float(v) if v else None for v in raw_values]
+        
+        # Tuples keep results shared through parse_data_cached from being modified by callers
+        return Leaders(players=tuple(players), teams=tuple(teams), values=tuple(values))
     except Exception as e:
-        logger.error(f"Error parsing HTML: {e}")
+        logger.error("Error parsing HTML: %s", e)
         return None
 
+# This part of the code memoizes parsing per page and statistic, so choosing the same statistic again returns instantly. The cache is cleared whenever the page is refreshed.
+@functools.lru_cache(maxsize=32)
+def parse_data_cached(html_content, stat_id):
+    """Return parse_data results, reusing earlier results for the same page and statistic."""
+    return parse_data(html_content, stat_id)
+
 # This part of the code saves the extracted data to a CSV file for future use, provides data persistence and allows for easy sharing or further analysis.
-def save_to_csv(df, stat_name):
-    """Save the dataframe to a CSV file."""
-    if df is None or df.empty:
+def save_to_csv(leaders, stat_name):
+    """Save the parsed leaders to a CSV file."""
+    if leaders is None or not leaders.players:
         logger.warning("No data to save to CSV.")
         return None
     
@@ -127,45 +339,66 @@ def save_to_csv(df, stat_name):
     filepath = f"data/{filename}_{timestamp}.csv"
     
     try:
-        df.to_csv(filepath, index=False)
-        logger.info(f"Data saved to {filepath}")
+        with open(filepath, 'w', buffering=CSV_BUFFER_SIZE, newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Player', 'Team', stat_name.title()])
+            writer.writerows(zip(leaders.players, leaders.teams, leaders.values))
+        logger.info("Data saved to %s", filepath)
         return filepath
     except Exception as e:
-        logger.error(f"Error saving CSV: {e}")
+        logger.error("Error saving CSV: %s", e)
         return None
 
+# This part of the code converts parsed leaders into a pandas DataFrame, for users who want to keep working with the data in pandas or a notebook.
+def to_dataframe(leaders, stat_name):
+    """Convert parsed leaders into a DataFrame with the statistic name as the value column."""
+    # Imported here so pandas is only loaded when a DataFrame is actually requested
+    import pandas as pd
+    
+    return pd.DataFrame({
+        'Player': leaders.players,
+        'Team': leaders.teams,
+        stat_name.title(): leaders.values
+    })
+
 # This part of the code combines all the functions to scrape a specific statistic, it handles data retrieval, processing, and storage process.
-def scrape_statistic(stat_name):
-    """Scrape data for the specified statistic and save to CSV."""
+def scrape_statistic(stat_name, html_content, as_dataframe=False):
+    """Scrape data for the specified statistic and save to CSV.
+    
+    Returns the parsed Leaders (or a DataFrame when as_dataframe is True) and the CSV path.
+    """
     if stat_name.lower() not in STAT_MAP:
-        logger.error(f"Invalid statistic name: {stat_name}")
+        logger.error("Invalid statistic name: %s", stat_name)
         return None, None
     
     stat_id = STAT_MAP[stat_name.lower()]
     
     try:
-        html_content = fetch_data(BASE_URL)
-        df = parse_data(html_content, stat_id)
+        leaders = parse_data_cached(html_content, stat_id)
         
-        if df is not None and not df.empty:
-            # Rename Value column to the actual statistic name
-            df = df.rename(columns={'Value': stat_name.title()})
-            
-            csv_path = save_to_csv(df, stat_name)
+        if leaders is not None and leaders.players:
+            csv_path = save_to_csv(leaders, stat_name)
             
-            return df, csv_path
+            if as_dataframe:
+                return to_dataframe(leaders, stat_name), csv_path
+            return leaders, csv_path
         else:
-            logger.warning(f"No data found for {stat_name}")
+            logger.warning("No data found for %s", stat_name)
             return None, None
     except Exception as e:
-        logger.error(f"Error scraping {stat_name}: {e}")
+        logger.error("Error scraping %s: %s", stat_name, e)
         return None, None
 
+# This part of the code scrapes several statistics at once from the same page, saving each one to its own CSV file.
+def scrape_many(stat_names, html_content, as_dataframe=False):
+    """Scrape several statistics and return a dict of stat name to (data, csv_path)."""
+    return {stat_name: scrape_statistic(stat_name, html_content, as_dataframe) for stat_name in stat_names}
+
 # This part of the code displays available statistics to the user when prompted, it helps users understand their options and make valid selections.
 def display_available_stats():
     """Display the available statistics that can be scraped."""
     print("\nAvailable Statistics:")
-    for i, stat in enumerate(sorted(STAT_MAP.keys()), 1):
+    for i, stat in enumerate(SORTED_STATS, 1):
         print(f"{i}. {stat.title()}")
 
 # This part of the code runs the main program loop, collecting user input and displaying results. It creates an interactive interface for users to select statistics to view.
@@ -180,41 +413,69 @@ def main():
         while True:
             display_available_stats()
             
-            choice = input("\nWhat statistic would you like to see? (type 'quit' to exit): ").strip().lower()
+            choice = input("\nWhat statistic would you like to see? (type 'all' to export every statistic, 'refresh' to reload data, 'quit' to exit): ").strip().lower()
             
             if choice == 'quit':
                 print("Exiting program. Goodbye!")
                 break
+            
+            if choice == 'all':
+                print("\nExporting all statistics...")
+                try:
+                    # The page is fetched on first use and then served from HTML_CACHE
+                    html_content = get_html(BASE_URL)
+                    results = scrape_many(SORTED_STATS, html_content)
+                    for stat_name in SORTED_STATS:
+                        _, csv_path = results[stat_name]
+                        if csv_path:
+                            print(f"{stat_name.title()}: {csv_path}")
+                        else:
+                            print(f"{stat_name.title()}: could not retrieve data.")
+                except Exception as e:
+                    print(f"An error occurred: {e}")
+                print("\n" + "-" * 50)
+                continue
+            
+            if choice in ('refresh', '--refresh'):
+                print("\nRefreshing data from Basketball Reference...")
+                try:
+                    get_html(BASE_URL, refresh=True)
+                    print("Data refreshed.")
+                except Exception as e:
+                    print(f"Could not refresh data: {e}")
+                print("\n" + "-" * 50)
+                continue
                 
             # Handles numeric input & convert to stat name.
             if choice.isdigit():
-                stats_list = sorted(STAT_MAP.keys())
                 choice_idx = int(choice) - 1
-                if 0 <= choice_idx < len(stats_list):
-                    choice = stats_list[choice_idx]
+                if 0 <= choice_idx < len(SORTED_STATS):
+                    choice = SORTED_STATS[choice_idx]
                 else:
-                    print(f"Invalid choice. Please enter a number between 1 and {len(stats_list)}.")
+                    print(f"Invalid choice. Please enter a number between 1 and {len(SORTED_STATS)}.")
                     continue
             
             if choice in STAT_MAP:
                 print(f"\nFetching top 15 leaders for {choice}...")
                 
                 try:
-                    df, csv_path = scrape_statistic(choice)
+                    # The page is fetched on first use and then served from HTML_CACHE
+                    html_content = get_html(BASE_URL)
+                    leaders, csv_path = scrape_statistic(choice, html_content)
                     
-                    if df is not None:
+                    if leaders is not None:
                         print(f"\nTop 15 {choice.title()} Leaders:")
                         print("===============================")
                         
                         # Formats the output for better readability
-                        for i, (_, row) in enumerate(df.iterrows(), 1):
-                            stat_value = row[choice.title()]
-                            if "percentage" in choice:
-                                formatted_value = f"{stat_value:.1f}%"
-                            else:
-                                formatted_value = f"{stat_value:.1f}"
-                                
-                            print(f"{i}. {row['Player']} ({row['Team']}): {formatted_value}")
+                        # Percentages are listed as fractions (e.g. .452), so scale them for display
+                        if "percentage" in choice:
+                            scale, suffix = 100.0, "%"
+                        else:
+                            scale, suffix = 1.0, ""
+                        formatted_values = [f"{value * scale:.1f}{suffix}" if value is not None else "N/A" for value in leaders.values]
+                        for i, (player, team, formatted_value) in enumerate(zip(leaders.players, leaders.teams, formatted_values), 1):
+                            print(f"{i}. {player} ({team}): {formatted_value}")
                         
                         if csv_path:
                             print(f"\nData saved to: {csv_path}")
@@ -230,7 +491,7 @@ def main():
     except KeyboardInterrupt:
         print("\nProgram interrupted. Exiting gracefully.")
     except Exception as e:
-        logger.critical(f"Unhandled exception: {e}")
+        logger.critical("Unhandled exception: %s", e)
         print(f"An unexpected error occurred: {e}")
     finally:
         print("Thank you for using the Basketball Reference Scraper!")